@@ -1,29 +1,40 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np
+from numba import njit
 import joblib
-import json
+import orjson
 import time
 import asyncio
-import sys
 import os
 import io
+import struct
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.ensemble import IsolationForest
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+import onnxruntime as ort
+from scipy.linalg.blas import sgemv
 from fastapi.responses import StreamingResponse
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from pydantic import BaseModel
 
-# Add parent dir to path so we can import trainer.py which contains `preprocess_spectra`
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-try:
-    from trainer import preprocess_spectra
-except ImportError:
-    # If the file runs locally inside the hackathon folder root.
-    sys.path.append(os.getcwd())
-    from trainer import preprocess_spectra
+from sugarcane.preprocessing import preprocess_spectra, sg_snv_into
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Worker pool behind asyncio.to_thread. Ticks are CPU-bound and the Numba
+    # kernels release the GIL, so one worker per core runs concurrent clients in
+    # parallel; asyncio's default of cpu_count + 4 would only oversubscribe cores.
+    # A fresh pool per lifespan keeps repeated startups (e.g. tests) working.
+    executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="tick")
+    asyncio.get_running_loop().set_default_executor(executor)
+    yield
+    executor.shutdown(wait=False)
 
-app = FastAPI(title="Sugarcane NIR Real-Time Prediction API")
+app = FastAPI(title="Sugarcane NIR Real-Time Prediction API", lifespan=lifespan)
 
 # Enable CORS for the frontend React app
 app.add_middleware(
@@ -34,6 +45,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Pre-sampled standard-normal rows reused as per-tick sensor noise
+NOISE_POOL_SIZE = 4096
+rng = np.random.default_rng(0)
+
 # Load Models
 print("Loading Models via Joblib...")
 try:
@@ -42,26 +57,103 @@ try:
     
     pls_model = joblib.load(os.path.join(root_dir, 'pls_model.pkl'))
     wavelengths = joblib.load(os.path.join(root_dir, 'wavelengths.pkl'))
-    X_test = np.load(os.path.join(root_dir, 'X_test_raw.npy'))
+    # float32 contiguous rows feed the compiled kernel without per-tick conversion
+    X_test = np.ascontiguousarray(np.load(os.path.join(root_dir, 'X_test_raw.npy')), dtype=np.float32)
     y_test = np.load(os.path.join(root_dir, 'y_test.npy'))
+    NOISE_POOL = rng.standard_normal(size=(NOISE_POOL_SIZE, X_test.shape[1]), dtype=np.float32)
     
     # Store clean wavelength float values
-    wavelengths_plot = [float(str(w).replace('amplitude-', '')) for w in wavelengths]
+    wavelengths_plot = np.char.replace(np.asarray(wavelengths, dtype=str), 'amplitude-', '').astype(np.float64).tolist()
     print(f"Loaded successfully. {len(X_test)} samples available for simulation.")
     
     print("Training Anomaly Detector (Isolation Forest) on baseline data...")
     X_test_prep = preprocess_spectra(X_test)
     iso_forest = IsolationForest(contamination=0.02, random_state=42)
     iso_forest.fit(X_test_prep)
+    # Compile the forest to ONNX so each tick is one native call instead of
+    # walking every tree through sklearn's Python wrappers.
+    iso_onnx = convert_sklearn(iso_forest, initial_types=[('X', FloatTensorType([1, X_test_prep.shape[1]]))],
+                               target_opset={'': 17, 'ai.onnx.ml': 3})
+    iso_sess = ort.InferenceSession(iso_onnx.SerializeToString(), providers=["CPUExecutionProvider"])
     print("Anomaly Detector Ready.")
+
+    # PLS predict is (X - x_mean) @ coef.T + intercept; fold the centering into
+    # one weight vector + bias so a tick is a single dot product. The bias is
+    # predict(0) = intercept - x_mean @ coef, taken through the public API.
+    pls_W = np.ascontiguousarray(pls_model.coef_.ravel(), dtype=np.float32)
+    pls_b = float(np.ravel(pls_model.predict(np.zeros((1, pls_W.shape[0]))))[0])
+    pls_folded = np.allclose(X_test_prep @ pls_W + pls_b, np.ravel(pls_model.predict(X_test_prep)), atol=1e-3)
+    if not pls_folded:
+        print("Warning: folded PLS weights disagree with pls_model.predict; falling back to pls_model.predict.")
 except Exception as e:
     print(f"Error loading models: {e}")
     print("Please make sure you have run `python trainer.py` first.")
     
-def add_industrial_noise(spectrum, noise_level=0.02):
-    noise = np.random.normal(0, noise_level, spectrum.shape)
-    baseline_drift = np.random.uniform(-0.01, 0.01)
-    return spectrum * (1 + noise) + baseline_drift
+@njit("void(float32[::1], float32[::1], float64, float64, float32[::1])", cache=True, fastmath=True, nogil=True, boundscheck=False)
+def _apply_noise(spectrum, z, noise_level, drift, out):
+    for j in range(spectrum.shape[0]):
+        out[j] = spectrum[j] * (1.0 + noise_level * z[j]) + drift
+
+def add_industrial_noise(spectrum, z, noise_level=0.02, out=None):
+    """Multiplicative noise from a standard-normal row `z` plus a random baseline drift."""
+    if out is None:
+        out = np.empty_like(spectrum)
+    baseline_drift = rng.uniform(-0.01, 0.01)
+    _apply_noise(spectrum, z, noise_level, baseline_drift, out)
+    return out
+
+@njit("UniTuple(float64, 2)(float32[::1], int16[::1])", cache=True, fastmath=True, nogil=True, boundscheck=False)
+def _quantize_i16(spectrum, out):
+    """Quantizes `spectrum` over its own [min, max] range into `out`; returns (min, max)."""
+    s_min = spectrum[0]
+    s_max = spectrum[0]
+    for j in range(1, spectrum.shape[0]):
+        s_min = min(s_min, spectrum[j])
+        s_max = max(s_max, spectrum[j])
+    scale = 32767.0 / (s_max - s_min) if s_max > s_min else 0.0
+    for j in range(spectrum.shape[0]):
+        out[j] = np.int16((spectrum[j] - s_min) * scale + 0.5)
+    return s_min, s_max
+
+def pack_frame(header, spectrum, out_q=None):
+    """
+    Binary websocket frame:
+    <u16 header length> <header JSON, space-padded to 4-byte alignment>
+    <f32 min> <f32 max> <int16 LE spectrum quantized over [min, max]>
+    """
+    hdr = orjson.dumps(header)
+    hdr += b" " * (-(2 + len(hdr)) % 4)
+    if out_q is None:
+        out_q = np.empty(spectrum.shape[0], dtype=np.int16)
+    s_min, s_max = _quantize_i16(spectrum, out_q)
+    # join copies straight from the int16 buffer, no intermediate tobytes()
+    return b"".join((struct.pack('<H', len(hdr)), hdr, struct.pack('<2f', s_min, s_max), memoryview(out_q)))
+
+def _compute_tick(raw_spectrum, actual_pol, z, noise_pct, threshold, buf_noisy, buf_prep, buf_q):
+    """CPU slice of one simulation tick; returns the packed binary frame."""
+    # Transform
+    noisy_spectrum = add_industrial_noise(raw_spectrum, z, noise_level=noise_pct/100.0, out=buf_noisy)
+    sg_snv_into(noisy_spectrum[None, :], buf_prep)
+    X_live_prep = buf_prep
+    
+    start_time = time.time()
+    if pls_folded:
+        # (1, N) float32 C-order row is also F-contiguous, so sgemv reads it without a copy
+        pred_pol = float(sgemv(1.0, X_live_prep, pls_W)[0] + pls_b)
+    else:
+        pred_pol = float(np.ravel(pls_model.predict(X_live_prep))[0])
+    is_anomaly = iso_sess.run(["label"], {"X": X_live_prep})[0][0, 0] == -1
+    inference_ms = (time.time() - start_time) * 1000
+    
+    header = {
+        "timestamp": time.time(),
+        "actual_pol": float(actual_pol),
+        "predicted_pol": pred_pol,
+        "inference_ms": inference_ms,
+        "alert": pred_pol < threshold,
+        "anomaly": bool(is_anomaly)
+    }
+    return pack_frame(header, noisy_spectrum, buf_q)
 
 # Websocket Connection Manager
 class ConnectionManager:
@@ -70,14 +162,24 @@ class ConnectionManager:
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
+        # Per-connection scratch buffers reused on every tick
+        websocket.state.buf_noisy = np.empty_like(X_test[0])
+        websocket.state.buf_prep = np.empty((1, X_test.shape[1]), dtype=np.float32)
+        websocket.state.buf_q = np.empty(X_test.shape[1], dtype=np.int16)
         self.active_connections.append(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+    async def broadcast(self, message: bytes):
+        # `message` is serialized once by the caller; sends run concurrently so a
+        # slow client doesn't hold up the others, and failed clients are dropped.
+        connections = list(self.active_connections)
+        results = await asyncio.gather(*(c.send_bytes(message) for c in connections), return_exceptions=True)
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)
 
 manager = ConnectionManager()
 
@@ -93,43 +195,37 @@ def get_config():
 @app.websocket("/ws/simulation")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
+    buf_noisy = websocket.state.buf_noisy
+    buf_prep = websocket.state.buf_prep
+    buf_q = websocket.state.buf_q
     idx = 0
+    # Random start so concurrent clients don't see identical noise sequences
+    tick = int(rng.integers(NOISE_POOL_SIZE))
     try:
         while True:
             # We wait for the client to ask for the next tick, or just stream continuously if client indicates.
             # Here we listen for optional settings updates (like noise level from frontend UI).
-            data = await websocket.receive_text()
-            config = json.loads(data)
+            # The dashboard sends config as a binary frame (no text decode); text frames
+            # from other clients are accepted too.
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            config = orjson.loads(message.get("bytes") or message["text"])
             
             noise_pct = config.get("noiseLevel", 2.0)
             
-            # Grab sample
-            raw_spectrum = X_test[idx]
-            actual_pol = y_test[idx]
-            
-            # Transform
-            noisy_spectrum = add_industrial_noise(raw_spectrum, noise_level=noise_pct/100.0)
-            X_live_prep = preprocess_spectra(noisy_spectrum.reshape(1, -1))
-            
-            start_time = time.time()
-            pred_pol = float(np.squeeze(pls_model.predict(X_live_prep)))
-            is_anomaly = iso_forest.predict(X_live_prep)[0] == -1
-            inference_ms = (time.time() - start_time) * 1000
-            
-            payload = {
-                "timestamp": time.time(),
-                "actual_pol": float(actual_pol),
-                "predicted_pol": pred_pol,
-                "inference_ms": inference_ms,
-                "noisy_spectrum": noisy_spectrum.tolist(),
-                "alert": pred_pol < config.get("threshold", 13.0),
-                "anomaly": bool(is_anomaly)
-            }
-            
-            await websocket.send_text(json.dumps(payload))
+            # Preprocessing + inference run on a worker thread (the Numba kernels
+            # release the GIL) so other connections' I/O isn't blocked.
+            z = NOISE_POOL[tick % NOISE_POOL_SIZE]
+            frame = await asyncio.to_thread(
+                _compute_tick, X_test[idx], y_test[idx], z, noise_pct,
+                config.get("threshold", 13.0), buf_noisy, buf_prep, buf_q,
+            )
+            await websocket.send_bytes(frame)
             
             # Loop sample index
             idx = (idx + 1) % len(X_test)
+            tick += 1
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -151,14 +247,15 @@ async def generate_report(data: ReportData):
     
     c.setFillColorRGB(0, 0, 0)
     c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, 700, f"Total Samples Processed: {len(data.predicted_pol)}")
+    pred = np.asarray(data.predicted_pol, dtype=np.float32)
+    c.drawString(50, 700, f"Total Samples Processed: {pred.size}")
     
-    avg_pol = sum(data.predicted_pol) / len(data.predicted_pol) if data.predicted_pol else 0
+    avg_pol = float(pred.mean()) if pred.size else 0.0
     c.drawString(50, 670, f"Average Predicted Pol (TS%): {avg_pol:.2f}%")
     
     # Calculate breaches
     threshold = 13.0
-    breaches = sum(1 for p in data.predicted_pol if p < threshold)
+    breaches = int((pred < threshold).sum())
     c.drawString(50, 640, f"Total Low-Pol Alerts: {breaches}")
     
     c.setFont("Helvetica-Bold", 12)
@@ -5,6 +5,22 @@ import { Canvas, useFrame } from '@react-three/fiber';
 import { OrbitControls, Box, Cylinder } from '@react-three/drei';
 import './index.css';
 
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+// Frame layout: <u16 header length> <header JSON (4-byte aligned)>
+// <f32 min> <f32 max> <int16 spectrum quantized over [min, max]>
+function decodeFrame(buffer) {
+  const view = new DataView(buffer);
+  const headerLen = view.getUint16(0, true);
+  const payload = JSON.parse(textDecoder.decode(new Uint8Array(buffer, 2, headerLen)));
+  const specOffset = 2 + headerLen;
+  const sMin = view.getFloat32(specOffset, true);
+  const scale = (view.getFloat32(specOffset + 4, true) - sMin) / 32767;
+  payload.noisy_spectrum = Float32Array.from(new Int16Array(buffer, specOffset + 8), q => sMin + q * scale);
+  return payload;
+}
+
 // 3D Digital Twin Component
 function SugarcaneBelt({ activeAlert, isRunning }) {
   const meshRef = useRef();
@@ -77,11 +93,12 @@ function App() {
   useEffect(() => {
     if (isRunning) {
       ws.current = new WebSocket('ws://localhost:8000/ws/simulation');
+      ws.current.binaryType = 'arraybuffer';
 
       ws.current.onopen = () => sendConfig();
 
       ws.current.onmessage = (event) => {
-        const payload = JSON.parse(event.data);
+        const payload = decodeFrame(event.data);
         handlePayload(payload);
 
         if (ws.current?.readyState === WebSocket.OPEN && isRunning) {
@@ -95,7 +112,7 @@ function App() {
 
   const sendConfig = () => {
     if (ws.current?.readyState === WebSocket.OPEN) {
-      ws.current.send(JSON.stringify({ noiseLevel, threshold }));
+      ws.current.send(textEncoder.encode(JSON.stringify({ noiseLevel, threshold })));
     }
   }
 
@@ -104,7 +121,7 @@ function App() {
 
     const spectrumData = wavelengths.map((wv, i) => ({
       wavelength: wv,
-      absorbance: data.noisy_spectrum[0][i] || data.noisy_spectrum[i]
+      absorbance: data.noisy_spectrum[i]
     }));
     setCurrentSpectrum(spectrumData);
 
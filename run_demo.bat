@@ -1,7 +1,7 @@
 @echo off
 echo Starting Sugarcane NIR Real-Time Web Platform...
 echo Loading Backend Models...
-start cmd /k ".\.venv\Scripts\Activate.ps1 & uvicorn backend.server:app"
+start cmd /k ".\.venv\Scripts\Activate.ps1 & uvicorn backend.server:app --http httptools --ws websockets"
 echo Loading Frontend Interface...
 start cmd /k "cd frontend & npm run dev"
 timeout /t 3 /nobreak > nul
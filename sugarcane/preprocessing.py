@@ -0,0 +1,122 @@
+"""
+Spectral preprocessing shared by the trainer and the live server:
+Savitzky-Golay 1st derivative + Standard Normal Variate (SNV).
+Kept free of pandas/matplotlib/model imports so the server loads only what it serves.
+"""
+import functools
+import numpy as np
+import scipy.signal
+from numba import njit
+
+# Savitzky-Golay settings: window_length=15, polyorder=2, deriv=1
+SG_WINDOW = 15
+SG_POLYORDER = 2
+
+# Interior coefficients in dot order: y[j] = sum_k SG_COEFFS[k] * x[j + k - SG_WINDOW // 2]
+SG_COEFFS = scipy.signal.savgol_coeffs(SG_WINDOW, SG_POLYORDER, deriv=1, use='dot').astype(np.float64)
+
+# savgol_filter's mode='interp' fits a polynomial to the first/last window instead of
+# padding, so each edge output is a fixed linear map of those SG_WINDOW samples.
+SG_EDGE = scipy.signal.savgol_filter(np.eye(SG_WINDOW), SG_WINDOW, SG_POLYORDER, deriv=1, axis=0)
+
+# Kernels use explicit C-contiguous signatures so they compile (or load from the
+# on-disk cache) at import time rather than on the first call.
+@njit("void(float32[:,::1], float64[::1], float32[:,::1])", cache=True, fastmath=True, nogil=True, boundscheck=False)
+def _sg_snv(x, coeffs, out):
+    """
+    Fused Savitzky-Golay (1st derivative) + SNV kernel, writes into `out`.
+    Each row is convolved once while accumulating a Welford running mean/M2
+    for SNV, then normalized in a second pass over the (cache-hot) output row.
+    """
+    n_rows, n = x.shape
+    window = coeffs.shape[0]
+    half = window // 2
+    tail = n - window
+    for r in range(n_rows):
+        mean = 0.0
+        m2 = 0.0
+        for j in range(n):
+            acc = 0.0
+            if j < half:
+                for k in range(window):
+                    acc += SG_EDGE[j, k] * x[r, k]
+            elif j >= n - half:
+                for k in range(window):
+                    acc += SG_EDGE[j - tail, k] * x[r, tail + k]
+            else:
+                for k in range(window):
+                    acc += coeffs[k] * x[r, j + k - half]
+            out[r, j] = acc
+            delta = acc - mean
+            mean += delta / (j + 1)
+            m2 += delta * (acc - mean)
+
+        inv = 1.0 / ((m2 / n) ** 0.5 + 1e-8)
+        for j in range(n):
+            out[r, j] = (out[r, j] - mean) * inv
+
+@njit("void(float64[:,::1])", cache=True, fastmath=True, nogil=True, boundscheck=False)
+def _snv(x):
+    """In-place SNV with a one-pass Welford mean/variance per row."""
+    n_rows, n = x.shape
+    for r in range(n_rows):
+        mean = 0.0
+        m2 = 0.0
+        for j in range(n):
+            delta = x[r, j] - mean
+            mean += delta / (j + 1)
+            m2 += delta * (x[r, j] - mean)
+
+        inv = 1.0 / ((m2 / n) ** 0.5 + 1e-8)
+        for j in range(n):
+            x[r, j] = (x[r, j] - mean) * inv
+
+def sg_snv_into(x, out):
+    """
+    Allocation-free SG + SNV for hot paths: `x` and `out` are preallocated
+    C-ordered float32 (n_samples, n_features) arrays with n_features >= SG_WINDOW.
+    """
+    _sg_snv(x, SG_COEFFS, out)
+
+def preprocess_spectra(X):
+    """
+    Standard Chemometrics preprocessing:
+    1. Savitzky-Golay filter for smoothing and 1st derivative
+    2. Standard Normal Variate (SNV) to scatter-correct
+    Both steps run fused in the compiled `_sg_snv` kernel; the output is a
+    C-ordered float32 (n_samples, n_features) block ready for BLAS.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    if X.ndim != 2 or X.shape[1] < SG_WINDOW:
+        raise ValueError(f"Expected spectra of shape (n_samples, n_features) with n_features >= {SG_WINDOW}, got {X.shape}")
+    X_snv = np.empty(X.shape, dtype=np.float32, order='C')
+    _sg_snv(X, SG_COEFFS, X_snv)
+    return X_snv
+
+@functools.lru_cache(maxsize=None)
+def savgol_matrix(n_features):
+    """
+    Banded (n_features, n_features) operator T such that
+    X @ T.T == savgol_filter(X, 15, 2, deriv=1) (mode='interp' edges included).
+    """
+    if n_features < SG_WINDOW:
+        raise ValueError(f"n_features must be >= {SG_WINDOW}, got {n_features}")
+    half = SG_WINDOW // 2
+    T = np.zeros((n_features, n_features))
+    for j in range(half, n_features - half):
+        T[j, j - half:j + half + 1] = SG_COEFFS
+    T[:half, :SG_WINDOW] = SG_EDGE[:half]
+    T[n_features - half:, n_features - SG_WINDOW:] = SG_EDGE[half + 1:]
+    T.setflags(write=False)
+    return T
+
+def preprocess_spectra_batch(X):
+    """
+    Bulk variant of `preprocess_spectra` for the training set:
+    the SG filter runs as one BLAS matmul against the cached banded operator,
+    followed by in-place SNV.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    X_sg = X @ savgol_matrix(X.shape[1]).T
+    _snv(X_sg)
+    return X_sg
@@ -1,14 +1,15 @@
 import pandas as pd
 import numpy as np
-import scipy.signal
 from sklearn.cross_decomposition import PLSRegression
 from sklearn.neural_network import MLPRegressor
 from sklearn.model_selection import train_test_split, cross_val_score, KFold
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.preprocessing import StandardScaler
 import joblib
+from joblib import Parallel, delayed
 import os
 import matplotlib.pyplot as plt
+from sugarcane.preprocessing import preprocess_spectra_batch
 
 def load_data(file_path):
     print(f"Loading data from {file_path}...")
@@ -22,7 +23,8 @@ def load_data(file_path):
     
     # Extract features (wavelengths)
     # The wavelengths are columns starting with 'amplitude' or numbers.
-    wavelength_cols = [col for col in df.columns if col.startswith('amplitude') or col.replace('.','',1).isdigit()]
+    is_wavelength = pd.to_numeric(df.columns.str.replace('amplitude-', '', regex=False), errors='coerce').notna()
+    wavelength_cols = list(df.columns[is_wavelength])
     
     X = df[wavelength_cols].values
     y = df['TS'].values
@@ -30,37 +32,20 @@ def load_data(file_path):
     print(f"Loaded {X.shape[0]} samples with {X.shape[1]} features (wavelengths).")
     return X, y, wavelength_cols
 
-def preprocess_spectra(X):
-    """
-    Standard Chemometrics preprocessing:
-    1. Savitzky-Golay filter for smoothing and 1st derivative
-    2. Standard Normal Variate (SNV) to scatter-correct
-    """
-    # 1. Savitzky-Golay Smoothing and 1st Derivative
-    # window_length=15, polyorder=2, deriv=1
-    X_sg = scipy.signal.savgol_filter(X, window_length=15, polyorder=2, deriv=1)
-    
-    # 2. Standard Normal Variate (SNV)
-    # For each spectrum, subtract mean and divide by standard deviation
-    mean = np.mean(X_sg, axis=1, keepdims=True)
-    std = np.std(X_sg, axis=1, keepdims=True)
-    X_snv = (X_sg - mean) / (std + 1e-8)
-    
-    return X_snv
+def _pls_cv_mse(n_components, X_train, y_train, cv):
+    pls = PLSRegression(n_components=n_components)
+    return -cross_val_score(pls, X_train, y_train, cv=cv, scoring='neg_mean_squared_error').mean()
 
 def train_pls(X_train, y_train):
     print("Finding optimal number of PLS components via Cross-Validation...")
     cv = KFold(n_splits=5, shuffle=True, random_state=42)
-    best_n = 1
-    lowest_mse = float('inf')
     
-    # Test up to 15 components
-    for i in range(1, 15):
-        pls = PLSRegression(n_components=i)
-        score = -cross_val_score(pls, X_train, y_train, cv=cv, scoring='neg_mean_squared_error').mean()
-        if score < lowest_mse:
-            lowest_mse = score
-            best_n = i
+    # Test up to 15 components, one candidate per core
+    scores = Parallel(n_jobs=-1, backend='loky')(
+        delayed(_pls_cv_mse)(i, X_train, y_train, cv) for i in range(1, 15)
+    )
+    best_n = int(np.argmin(scores)) + 1
+    lowest_mse = scores[best_n - 1]
             
     print(f"Best number of PLS components: {best_n} (CV MSE: {lowest_mse:.4f})")
     
@@ -98,7 +83,7 @@ def main():
     
     # Preprocess
     print("Preprocessing spectra (Savitzky-Golay + SNV)...")
-    X_prep = preprocess_spectra(X)
+    X_prep = preprocess_spectra_batch(X)
     
     # Train/Test Split
     X_train, X_test, y_train, y_test = train_test_split(X_prep, y, test_size=0.2, random_state=42)